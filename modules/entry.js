@@ -0,0 +1,25 @@
+/**
+ * Columns needed to build an entry response
+ */
+export const entrySelect = {
+  id: true,
+  title: true,
+  content: true,
+  image_url: true,
+  created_at: true,
+  updated_at: true
+};
+
+/**
+ * Map a diary_entries row to the API shape
+ */
+export function toEntryResponse(entry) {
+  return {
+    id: entry.id,
+    title: entry.title,
+    content: entry.content,
+    imageUrl: entry.image_url,
+    createdAt: entry.created_at,
+    updatedAt: entry.updated_at
+  };
+}
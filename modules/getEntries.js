@@ -1,22 +1,59 @@
 import { prisma } from "./prisma.js";
-import { verifyAccessToken } from "./jwt.js";
+import { entrySelect, toEntryResponse } from "./entry.js";
 
-export async function getEntries({ token }) {
-  const payload = verifyAccessToken(token);
-  const userId = payload.sub;
+const DEFAULT_LIMIT = 50;
+const MAX_LIMIT = 100;
+
+function encodeCursor(entry) {
+  return Buffer.from(`${entry.created_at.toISOString()}|${entry.id}`).toString("base64url");
+}
+
+function decodeCursor(cursor) {
+  const raw = Buffer.from(cursor, "base64url").toString();
+  const sep = raw.indexOf("|");
+  const createdAt = new Date(raw.slice(0, sep));
+  const id = raw.slice(sep + 1);
+
+  if (sep < 0 || !id || Number.isNaN(createdAt.getTime())) {
+    throw new Error("INVALID_CURSOR");
+  }
+  return { createdAt, id };
+}
+
+/**
+ * Keyset pagination on (created_at, id), newest first. Opt-in: without
+ * `limit` or `cursor` the full history is returned, as clients that don't
+ * follow X-Next-Cursor expect.
+ */
+export async function getEntries({ userId, limit, cursor }) {
+  const paginate = limit !== undefined || cursor !== undefined;
+  const take = paginate
+    ? Math.min(Math.max(Number.parseInt(limit, 10) || DEFAULT_LIMIT, 1), MAX_LIMIT)
+    : undefined;
+
+  const where = { user_id: userId };
+  if (cursor) {
+    const after = decodeCursor(cursor);
+    where.OR = [
+      { created_at: { lt: after.createdAt } },
+      { created_at: after.createdAt, id: { lt: after.id } }
+    ];
+  }
 
   const entries = await prisma.diary_entries.findMany({
-    where: { user_id: userId },
-    orderBy: { created_at: 'desc' }
+    where,
+    orderBy: [{ created_at: 'desc' }, { id: 'desc' }],
+    take: paginate ? take + 1 : undefined,
+    select: entrySelect
   });
 
-  return entries.map(entry => ({
-    id: entry.id,
-    title: entry.title,
-    content: entry.content,
-    imageUrl: entry.image_url,
-    createdAt: entry.created_at,
-    updatedAt: entry.updated_at
-  }));
-}
+  const hasMore = paginate && entries.length > take;
+  if (hasMore) {
+    entries.pop();
+  }
 
+  return {
+    entries: entries.map(toEntryResponse),
+    nextCursor: hasMore ? encodeCursor(entries[entries.length - 1]) : null
+  };
+}
@@ -1,28 +1,20 @@
 import { prisma } from "./prisma.js";
-import { verifyAccessToken } from "./jwt.js";
+import { entrySelect, toEntryResponse } from "./entry.js";
 
-export async function getEntry({ token, entryId }) {
-  const payload = verifyAccessToken(token);
-  const userId = payload.sub;
-
-  const entry = await prisma.diary_entries.findFirst({
-    where: { 
+export async function getEntry({ userId, entryId }) {
+  // Ownership is part of the unique lookup, so other users' ids read as 404
+  const entry = await prisma.diary_entries.findUnique({
+    where: {
       id: entryId,
       user_id: userId
-    }
+    },
+    select: entrySelect
   });
 
   if (!entry) {
     throw new Error("ENTRY_NOT_FOUND");
   }
 
-  return {
-    id: entry.id,
-    title: entry.title,
-    content: entry.content,
-    imageUrl: entry.image_url,
-    createdAt: entry.created_at,
-    updatedAt: entry.updated_at
-  };
+  return toEntryResponse(entry);
 }
 
@@ -0,0 +1,71 @@
+import crypto from "crypto";
+import { prisma } from "./prisma.js";
+import { entrySelect } from "./entry.js";
+import { logger } from "./logger.js";
+
+// Collect creates for this many ms and write them with one INSERT.
+// 0 (the default) disables batching.
+const BATCH_WINDOW_MS = Number(process.env.ENTRY_BATCH_WINDOW_MS || 0);
+const BATCH_MAX = 50;
+
+let pending = [];
+let timer = null;
+
+async function flush() {
+  clearTimeout(timer);
+  timer = null;
+  const batch = pending;
+  pending = [];
+
+  try {
+    const rows = await prisma.diary_entries.createManyAndReturn({
+      data: batch.map((item) => item.data),
+      select: entrySelect
+    });
+    const byId = new Map(rows.map((row) => [row.id, row]));
+    for (const item of batch) {
+      const row = byId.get(item.data.id);
+      if (row) {
+        item.resolve(row);
+      } else {
+        // Not expected from INSERT ... RETURNING, but never resolve undefined:
+        // read the row back by its pre-assigned id instead
+        prisma.diary_entries
+          .findUnique({ where: { id: item.data.id }, select: entrySelect })
+          .then((found) => found ?? Promise.reject(new Error("Batched entry insert returned no row")))
+          .then(item.resolve, item.reject);
+      }
+    }
+  } catch (error) {
+    // One bad row fails the whole INSERT; retry individually so only it fails
+    logger.warn("[insertEntry] Batch insert failed, retrying one by one", {
+      size: batch.length,
+      message: error.message
+    });
+    for (const item of batch) {
+      prisma.diary_entries
+        .create({ data: item.data, select: entrySelect })
+        .then(item.resolve, item.reject);
+    }
+  }
+}
+
+/**
+ * Insert a diary entry, coalescing bursts into a single multi-row INSERT
+ * when ENTRY_BATCH_WINDOW_MS is set
+ */
+export function insertEntry(data) {
+  if (BATCH_WINDOW_MS <= 0) {
+    return prisma.diary_entries.create({ data, select: entrySelect });
+  }
+
+  return new Promise((resolve, reject) => {
+    // Pre-assign the id so each caller can find its row in the batch result
+    pending.push({ data: { id: crypto.randomUUID(), ...data }, resolve, reject });
+    if (pending.length >= BATCH_MAX) {
+      flush();
+    } else {
+      timer ??= setTimeout(flush, BATCH_WINDOW_MS);
+    }
+  });
+}
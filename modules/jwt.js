@@ -1,13 +1,22 @@
 import 'dotenv/config';
+import crypto from "crypto";
 import jwt from "jsonwebtoken";
 
 const JWT_SECRET = process.env.JWT_SECRET;
 const JWT_EXPIRES_IN = process.env.JWT_EXPIRES_IN || "7d";
+const TOKEN_CACHE_TTL_MS = Number(process.env.TOKEN_CACHE_TTL_MS ?? 30_000);
+const TOKEN_CACHE_MAX = 10_000;
+// Stop serving a cached payload this long before the token itself expires
+const TOKEN_EXPIRY_MARGIN_MS = 5_000;
 
 if (!JWT_SECRET) {
   throw new Error("JWT_SECRET is not defined");
 }
 
+// sha256(token) -> { payload, expiresAt }. Map keeps insertion order, so the
+// first key is always the least recently used one.
+const tokenCache = new Map();
+
 export function createAccessToken({ userId }) {
   return jwt.sign(
     {
@@ -25,9 +34,44 @@ export function signJwt({ userId }) {
 
 /**
  * Verify and decode JWT
+ *
+ * Decoded payloads are cached for a short time, keyed by a hash of the
+ * token (the token itself is never stored), and never past the token's own
+ * `exp` claim.
  */
 export function verifyAccessToken(token) {
-  return jwt.verify(token, JWT_SECRET);
+  if (TOKEN_CACHE_TTL_MS <= 0) {
+    return jwt.verify(token, JWT_SECRET);
+  }
+
+  const key = crypto.createHash("sha256").update(token).digest("base64");
+  const now = Date.now();
+
+  const cached = tokenCache.get(key);
+  if (cached) {
+    tokenCache.delete(key);
+    if (cached.expiresAt > now) {
+      tokenCache.set(key, cached);
+      return cached.payload;
+    }
+  }
+
+  const payload = jwt.verify(token, JWT_SECRET);
+
+  let expiresAt = now + TOKEN_CACHE_TTL_MS;
+  if (payload.exp) {
+    expiresAt = Math.min(expiresAt, payload.exp * 1000 - TOKEN_EXPIRY_MARGIN_MS);
+  }
+  if (expiresAt <= now) {
+    return payload;
+  }
+
+  if (tokenCache.size >= TOKEN_CACHE_MAX) {
+    tokenCache.delete(tokenCache.keys().next().value);
+  }
+  tokenCache.set(key, { payload, expiresAt });
+
+  return payload;
 }
 
 /**
@@ -35,10 +79,29 @@ export function verifyAccessToken(token) {
  */
 export function extractTokenFromHeader(req) {
   const header = req.headers.authorization;
-  if (!header) return null;
+  if (!header?.startsWith("Bearer ")) return null;
 
-  const [type, token] = header.split(" ");
-  if (type !== "Bearer" || !token) return null;
+  const token = header.slice(7);
+  if (!token || token.includes(" ")) return null;
 
   return token;
 }
+
+/**
+ * Express middleware: verify the Bearer token and expose its subject as
+ * req.userId
+ */
+export function requireAuth(req, res, next) {
+  const token = extractTokenFromHeader(req);
+  if (!token) {
+    return res.status(401).json({ detail: "No token provided" });
+  }
+
+  try {
+    req.userId = verifyAccessToken(token).sub;
+  } catch {
+    return res.status(401).json({ detail: "Invalid authentication credentials" });
+  }
+
+  next();
+}
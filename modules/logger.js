@@ -0,0 +1,29 @@
+import 'dotenv/config';
+
+const LEVELS = { debug: 10, info: 20, warn: 30, error: 40, silent: 100 };
+const threshold = LEVELS[process.env.LOG_LEVEL] ?? LEVELS.info;
+
+/**
+ * Levelled console logger. Pass `data` as a function to build it lazily;
+ * it is only called when the level is enabled.
+ */
+function write(level, sink) {
+  if (LEVELS[level] < threshold) {
+    return () => {};
+  }
+  return (message, data) => {
+    const details = typeof data === "function" ? data() : data;
+    if (details === undefined) {
+      sink(message);
+    } else {
+      sink(message, details);
+    }
+  };
+}
+
+export const logger = {
+  debug: write("debug", console.debug),
+  info: write("info", console.info),
+  warn: write("warn", console.warn),
+  error: write("error", console.error)
+};
@@ -4,7 +4,8 @@ import bcrypt from "bcrypt";
 
 export async function loginUser({ email, password }) {
   const existing = await prisma.users.findUnique({
-    where: { email }
+    where: { email },
+    select: { id: true, email: true, displayName: true, password_hash: true }
   });
 
   if (!existing) {
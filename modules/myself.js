@@ -1,10 +1,9 @@
 import { prisma } from "./prisma.js";
-import { verifyAccessToken } from "./jwt.js";
 
-export async function myself({ token }) {
-  const payload = verifyAccessToken(token);
+export async function myself({ userId }) {
   const existing = await prisma.users.findUnique({
-    where: { id: payload.sub }
+    where: { id: userId },
+    select: { id: true, email: true, displayName: true }
   });
     if (!existing) {
     throw new Error("USER_NOT_FOUND");
@@ -2,25 +2,54 @@ import 'dotenv/config';
 import { PrismaClient } from "@prisma/client";
 import { PrismaPg } from "@prisma/adapter-pg";
 import pg from "pg";
+import { logger } from "./logger.js";
 
 const globalForPrisma = globalThis;
 
-const pool = new pg.Pool({
-  connectionString: process.env.DATABASE_URL,
-  ssl: {
-    rejectUnauthorized: true
-  }
-});
+function createPrismaClient() {
+  // One bounded pool per process, shared by every request
+  const pool = new pg.Pool({
+    connectionString: process.env.DATABASE_URL,
+    ssl: {
+      rejectUnauthorized: true
+    },
+    max: Number(process.env.DB_POOL_MAX || 10),
+    idleTimeoutMillis: 30_000,
+    // Fail fast instead of queueing forever when every connection is busy
+    connectionTimeoutMillis: Number(process.env.DB_POOL_TIMEOUT_MS || 5000),
+    statement_timeout: Number(process.env.DB_STATEMENT_TIMEOUT_MS || 5000)
+  });
 
-const adapter = new PrismaPg(pool);
+  const adapter = new PrismaPg(pool);
 
-export const prisma =
-  globalForPrisma.prisma ??
-  new PrismaClient({
+  return new PrismaClient({
     adapter,
     log: ["error"]
   });
+}
+
+export const prisma = globalForPrisma.prisma ?? createPrismaClient();
 
 if (process.env.NODE_ENV !== "production") {
   globalForPrisma.prisma = prisma;
 }
+
+/**
+ * Open the engine's connections once at startup (with backoff) so the first
+ * requests don't pay for it. Meant to run in the background after listen;
+ * Prisma still connects lazily if this fails.
+ */
+export async function connectPrisma({ retries = 5, delayMs = 500 } = {}) {
+  for (let attempt = 1; attempt <= retries; attempt++) {
+    try {
+      await prisma.$connect();
+      return true;
+    } catch (error) {
+      logger.error(`Prisma connect failed (attempt ${attempt}/${retries}):`, error.message);
+      if (attempt < retries) {
+        await new Promise((resolve) => setTimeout(resolve, delayMs * 2 ** (attempt - 1)));
+      }
+    }
+  }
+  return false;
+}
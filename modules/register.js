@@ -5,24 +5,26 @@ import { hashPassword } from "./password.js";
 import { signJwt } from "./jwt.js";
 
 export async function registerUser({ email, password, displayName }) {
-  const existing = await prisma.users.findUnique({
-    where: { email }
-  });
-
-  if (existing) {
-    throw new Error("EMAIL_EXISTS");
-  }
-
   const password_hash = await hashPassword(password);
 
-  const user = await prisma.users.create({
-    data: {
-      id: crypto.randomUUID(),
-      email,
-      password_hash,
-      displayName
+  // Rely on the unique index instead of a separate lookup round-trip
+  let user;
+  try {
+    user = await prisma.users.create({
+      data: {
+        id: crypto.randomUUID(),
+        email,
+        password_hash,
+        displayName
+      },
+      select: { id: true, email: true, displayName: true }
+    });
+  } catch (error) {
+    if (error.code === "P2002") {
+      throw new Error("EMAIL_EXISTS");
     }
-  });
+    throw error;
+  }
 
   const token = signJwt({ userId: user.id });
 
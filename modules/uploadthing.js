@@ -0,0 +1,6 @@
+import 'dotenv/config';
+import { UTApi } from "uploadthing/server";
+
+// One client per process so its HTTP connections are reused across requests.
+// Reads UPLOADTHING_TOKEN from the environment.
+export const utapi = new UTApi();
@@ -0,0 +1,5 @@
+-- DropIndex
+DROP INDEX "diary_entries_user_id_idx";
+
+-- CreateIndex
+CREATE INDEX "diary_entries_user_id_created_at_idx" ON "diary_entries"("user_id", "created_at" DESC);
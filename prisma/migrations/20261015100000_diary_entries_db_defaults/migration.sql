@@ -0,0 +1,3 @@
+-- AlterTable
+ALTER TABLE "diary_entries" ALTER COLUMN "id" SET DEFAULT (gen_random_uuid())::text,
+ALTER COLUMN "updated_at" SET DEFAULT CURRENT_TIMESTAMP;
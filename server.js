@@ -1,20 +1,44 @@
+// libuv's threadpool (bcrypt, crypto, DNS for new DB connections) defaults to
+// 4 threads. It is sized before any JS runs, so set UV_THREADPOOL_SIZE (e.g. 16)
+// in the deployment environment; setting it here or in .env has no effect.
 import "dotenv/config";
+import cluster from "cluster";
 import express from "express";
 import cors from "cors";
 import multer from "multer";
+import { unlink } from "fs/promises";
 
 import { registerUser } from "./modules/register.js";
 import { loginUser } from "./modules/login.js";
 import { myself } from "./modules/myself.js";
-import { extractTokenFromHeader } from "./modules/jwt.js";
-import { createEntry } from "./modules/createEntry.js";
+import { requireAuth } from "./modules/jwt.js";
+import { createEntry, MAX_IMAGE_BYTES, ALLOWED_IMAGE_TYPES } from "./modules/createEntry.js";
 import { getEntries } from "./modules/getEntries.js";
 import { getEntry } from "./modules/getEntry.js";
 import { deleteEntry } from "./modules/deleteEntry.js";
+import { connectPrisma, prisma } from "./modules/prisma.js";
+import { logger } from "./modules/logger.js";
 
 const app = express();
-const upload = multer({ storage: multer.memoryStorage() });
+app.disable("x-powered-by");
+const upload = multer({
+  // Spool uploads to the OS temp dir instead of holding them in memory
+  storage: multer.diskStorage({}),
+  // Abort oversized uploads while streaming instead of buffering them first
+  limits: { fileSize: MAX_IMAGE_BYTES, files: 1 },
+  // Reject unsupported types from the part headers, before any bytes are written
+  fileFilter: (req, file, cb) => {
+    if (ALLOWED_IMAGE_TYPES.has(file.mimetype)) {
+      return cb(null, true);
+    }
+    cb(new Error("UNSUPPORTED_MEDIA_TYPE"));
+  },
+});
 const PORT = process.env.PORT || 8000;
+// Processes to run; each has its own event loop and DB_POOL_MAX connections
+const WORKERS = Number(process.env.WEB_CONCURRENCY || 1);
+// Longest we wait for in-flight requests before exiting anyway
+const SHUTDOWN_TIMEOUT_MS = Number(process.env.SHUTDOWN_TIMEOUT_MS || 10_000);
 
 /* ======================================================
    ✅ CORS (Node 24 safe, handles OPTIONS automatically)
@@ -25,8 +49,11 @@ app.use(
       "https://diary-app-mu-azure.vercel.app",
       "http://localhost:5173",
     ],
-    methods: ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    methods: ["GET", "POST", "DELETE"],
     allowedHeaders: ["Content-Type", "Authorization"],
+    exposedHeaders: ["X-Next-Cursor"],
+    // Let browsers cache preflight results instead of repeating OPTIONS
+    maxAge: 86400,
   })
 );
 
@@ -57,7 +84,7 @@ app.post("/api/auth/register", async (req, res) => {
     if (error.message === "EMAIL_EXISTS") {
       return res.status(400).json({ detail: "Email already registered" });
     }
-    console.error("🔥 REGISTER ERROR:", error);
+    logger.error("🔥 REGISTER ERROR:", error);
     res.status(500).json({ detail: "Internal server error" });
   }
 });
@@ -76,39 +103,38 @@ app.post("/api/auth/login", async (req, res) => {
     ) {
       return res.status(400).json({ detail: "Invalid email or password" });
     }
-    console.error("🔥 LOGIN ERROR:", error);
+    logger.error("🔥 LOGIN ERROR:", error);
     res.status(500).json({ detail: "Internal server error" });
   }
 });
 
-app.get("/api/auth/me", async (req, res) => {
+app.get("/api/auth/me", requireAuth, async (req, res) => {
   try {
-    const token = extractTokenFromHeader(req);
-    if (!token) {
-      return res.status(401).json({ detail: "No token provided" });
-    }
-    const user = await myself({ token });
+    const user = await myself({ userId: req.userId });
     res.json(user);
-  } catch {
-    res.status(401).json({ detail: "Invalid authentication credentials" });
+  } catch (error) {
+    if (error.message === "USER_NOT_FOUND") {
+      return res.status(401).json({ detail: "Invalid authentication credentials" });
+    }
+    logger.error("🔥 ME ERROR:", error);
+    res.status(500).json({ detail: "Internal server error" });
   }
 });
 
 /* ======================================================
-   DIARY ROUTES
+   DIARY ROUTES (all authenticated)
 ====================================================== */
-app.post("/api/diary/entries", upload.single("image"), async (req, res) => {
-  try {
-    const token = extractTokenFromHeader(req);
-    if (!token) {
-      return res.status(401).json({ detail: "No token provided" });
-    }
+const diary = express.Router();
+diary.use(requireAuth);
 
+// Authenticate before multer so anonymous uploads are never buffered
+diary.post("/entries", upload.single("image"), async (req, res) => {
+  try {
     const { title, content } = req.body;
     const imageFile = req.file;
 
     const entry = await createEntry({
-      token,
+      userId: req.userId,
       title,
       content,
       imageFile,
@@ -116,51 +142,65 @@ app.post("/api/diary/entries", upload.single("image"), async (req, res) => {
 
     res.status(201).json(entry);
   } catch (error) {
-    console.error("🔥 CREATE ENTRY ERROR:", error);
+    logger.error("🔥 CREATE ENTRY ERROR:", error);
     res.status(500).json({ detail: "Internal server error" });
+  } finally {
+    if (req.file?.path) {
+      unlink(req.file.path).catch(() => {});
+    }
   }
 });
 
-app.get("/api/diary/entries", async (req, res) => {
+diary.get("/entries", async (req, res) => {
   try {
-    const token = extractTokenFromHeader(req);
-    if (!token) {
-      return res.status(401).json({ detail: "No token provided" });
+    const { entries, nextCursor } = await getEntries({
+      userId: req.userId,
+      limit: req.query.limit,
+      cursor: req.query.cursor,
+    });
+    if (nextCursor) {
+      res.set("X-Next-Cursor", nextCursor);
     }
-    const entries = await getEntries({ token });
     res.json(entries);
-  } catch {
-    res.status(401).json({ detail: "Invalid authentication credentials" });
+  } catch (error) {
+    if (error.message === "INVALID_CURSOR") {
+      return res.status(400).json({ detail: "Invalid cursor" });
+    }
+    logger.error("🔥 GET ENTRIES ERROR:", error);
+    res.status(500).json({ detail: "Internal server error" });
   }
 });
 
-app.get("/api/diary/entries/:id", async (req, res) => {
+diary.get("/entries/:id", async (req, res) => {
   try {
-    const token = extractTokenFromHeader(req);
-    if (!token) {
-      return res.status(401).json({ detail: "No token provided" });
-    }
     const entry = await getEntry({
-      token,
+      userId: req.userId,
       entryId: req.params.id,
     });
+
+    // Entries rarely change, so let clients revalidate instead of refetching
+    res.set({
+      ETag: `W/"${entry.updatedAt.getTime()}"`,
+      "Last-Modified": entry.updatedAt.toUTCString(),
+      "Cache-Control": "private, must-revalidate",
+    });
+    if (req.fresh) {
+      return res.status(304).end();
+    }
     res.json(entry);
   } catch (error) {
     if (error.message === "ENTRY_NOT_FOUND") {
       return res.status(404).json({ detail: "Entry not found" });
     }
-    res.status(401).json({ detail: "Invalid authentication credentials" });
+    logger.error("🔥 GET ENTRY ERROR:", error);
+    res.status(500).json({ detail: "Internal server error" });
   }
 });
 
-app.delete("/api/diary/entries/:id", async (req, res) => {
+diary.delete("/entries/:id", async (req, res) => {
   try {
-    const token = extractTokenFromHeader(req);
-    if (!token) {
-      return res.status(401).json({ detail: "No token provided" });
-    }
     const result = await deleteEntry({
-      token,
+      userId: req.userId,
       entryId: req.params.id,
     });
     res.json(result);
@@ -168,13 +208,150 @@ app.delete("/api/diary/entries/:id", async (req, res) => {
     if (error.message === "ENTRY_NOT_FOUND") {
       return res.status(404).json({ detail: "Entry not found" });
     }
+    logger.error("🔥 DELETE ENTRY ERROR:", error);
     res.status(500).json({ detail: "Internal server error" });
   }
 });
 
+app.use("/api/diary", diary);
+
 /* ======================================================
-   🚀 START SERVER (NORMAL EXPRESS)
+   ERROR HANDLER
 ====================================================== */
-app.listen(PORT, "0.0.0.0", () => {
-  console.log(`🚀 Server running on http://localhost:${PORT}`);
+app.use((error, req, res, next) => {
+  if (error instanceof multer.MulterError) {
+    if (error.code === "LIMIT_FILE_SIZE") {
+      return res.status(413).json({ detail: "File too large (max 4MB)" });
+    }
+    return res.status(400).json({ detail: error.message });
+  }
+  if (error.message === "UNSUPPORTED_MEDIA_TYPE") {
+    return res.status(415).json({ detail: "Only image files are allowed" });
+  }
+  // Client errors from body parsers etc. (malformed JSON, body too large)
+  const status = error.status ?? error.statusCode;
+  if (status >= 400 && status < 500) {
+    return res.status(status).json({ detail: error.message });
+  }
+  logger.error("🔥 UNHANDLED ERROR:", error);
+  res.status(500).json({ detail: "Internal server error" });
 });
+
+/* ======================================================
+   🚀 START SERVER (NORMAL EXPRESS)
+====================================================== */
+if (cluster.isPrimary && WORKERS > 1) {
+  let shuttingDown = false;
+  let restartDelayMs = 0;
+
+  const forkWorker = () => {
+    const worker = cluster.fork();
+    worker.startedAt = Date.now();
+  };
+
+  for (let i = 0; i < WORKERS; i++) {
+    forkWorker();
+  }
+  cluster.on("exit", (worker, code, signal) => {
+    if (shuttingDown || worker.exitedAfterDisconnect) {
+      return;
+    }
+    // Back off while workers keep dying right after start (e.g. listen errors)
+    const uptimeMs = Date.now() - worker.startedAt;
+    restartDelayMs = uptimeMs < 10_000 ? Math.min(Math.max(restartDelayMs * 2, 1000), 30_000) : 0;
+    logger.error(`Worker ${worker.process.pid} exited (${signal || code}), restarting in ${restartDelayMs}ms`);
+    setTimeout(() => {
+      if (!shuttingDown) {
+        forkWorker();
+      }
+    }, restartDelayMs);
+  });
+
+  // Pass the signal on to every worker and exit once they have all drained
+  const shutdownCluster = (signal) => {
+    if (shuttingDown) {
+      return;
+    }
+    shuttingDown = true;
+    logger.info(`${signal} received, stopping ${Object.keys(cluster.workers).length} workers`);
+
+    const exitWhenDrained = () => {
+      if (Object.keys(cluster.workers).length === 0) {
+        process.exit(0);
+      }
+    };
+    cluster.on("exit", exitWhenDrained);
+    for (const worker of Object.values(cluster.workers)) {
+      worker.process.kill(signal);
+    }
+    exitWhenDrained();
+    setTimeout(() => process.exit(1), SHUTDOWN_TIMEOUT_MS + 1000).unref();
+  };
+  process.on("SIGTERM", shutdownCluster);
+  process.on("SIGINT", shutdownCluster);
+
+  logger.info(`🚀 Started ${WORKERS} workers on http://localhost:${PORT}`);
+} else {
+  const server = app.listen(PORT, "0.0.0.0", () => {
+    logger.info(`🚀 Server running on http://localhost:${PORT}`);
+  });
+
+  // Warm the DB connection without holding up listen; Prisma falls back to
+  // connecting on the first query if this never succeeds
+  connectPrisma().then((connected) => {
+    if (!connected) {
+      logger.error("Database unreachable at startup; will retry on first query");
+    }
+  });
+
+  // Node closes idle keep-alive sockets after 5s; keep them longer than the
+  // proxy in front of us so clients reuse connections instead of reconnecting
+  server.keepAliveTimeout = Number(process.env.KEEP_ALIVE_TIMEOUT_MS || 65_000);
+  server.headersTimeout = server.keepAliveTimeout + 1000;
+
+  // Finish in-flight requests, then release DB connections before exiting
+  let shuttingDown = false;
+  const inFlight = new Set();
+
+  // Keep-alive sockets would otherwise stay open after their last response
+  // and hold server.close() until keepAliveTimeout
+  server.on("request", (req, res) => {
+    if (shuttingDown) {
+      res.shouldKeepAlive = false;
+    }
+    inFlight.add(res);
+    res.on("finish", () => {
+      inFlight.delete(res);
+      if (shuttingDown) {
+        setImmediate(() => server.closeIdleConnections());
+      }
+    });
+  });
+
+  const shutdown = (signal) => {
+    // Ctrl+C reaches workers directly and again via the primary; act once
+    if (shuttingDown) {
+      return;
+    }
+    shuttingDown = true;
+    logger.info(`${signal} received, shutting down`);
+    for (const res of inFlight) {
+      if (!res.headersSent) {
+        res.shouldKeepAlive = false;
+      }
+    }
+    server.close(async () => {
+      await prisma.$disconnect();
+      process.exit(0);
+    });
+    server.closeIdleConnections();
+    // Don't let one slow request hold the process open indefinitely
+    setTimeout(() => {
+      logger.error("Shutdown timed out, forcing exit");
+      server.closeAllConnections();
+      process.exit(1);
+    }, SHUTDOWN_TIMEOUT_MS).unref();
+  };
+  process.on("SIGTERM", shutdown);
+  process.on("SIGINT", shutdown);
+}